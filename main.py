@@ -5,23 +5,127 @@ Converts Berufsschule HTML schedule to ICS calendar format
 """
 
 import re
+import sys
+import importlib.util
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from bs4 import BeautifulSoup
 import datetime
-from icalendar import Calendar, Event
-import pytz
+import zoneinfo
 from pathlib import Path
 
+# bs4 is imported where it is used so the window opens without waiting for it
+
+# Prefer the much faster lxml parser, fall back to the built-in one
+HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+# Date cell like "15. Sep" -> day number and month name
+_DATE_RE = re.compile(r'(\d{1,2})\.\s*(\w+)')
+
+# German month name prefixes to month numbers
+_MONTH_MAP = {
+    'jan': 1, 'feb': 2, 'mär': 3, 'apr': 4, 'mai': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'okt': 10, 'nov': 11, 'dez': 12
+}
+
+# Timezone of the school, loaded on first use (needs tzdata on Windows)
+_TZ_NAME = 'Europe/Berlin'
+
+# Subjects to ignore
+_IGNORE_SUBJECTS = frozenset({"#NV", "Frei", "Betrieb", "Feiertag", "", " "})
+
+# Fixed VCALENDAR wrapper around the events
+_CALENDAR_START = (b'BEGIN:VCALENDAR\r\n'
+                   b'VERSION:2.0\r\n'
+                   b'PRODID:-//Berufsschule Schedule Converter//mxm.dk//\r\n'
+                   b'CALSCALE:GREGORIAN\r\n')
+_CALENDAR_END = b'END:VCALENDAR\r\n'
+
+
+# Minimal VEVENT writer, the event field set is small and fixed so there
+# is no need for a full iCalendar library
+def _escape_text(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;')
+                .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def _fold(line):
+    # RFC 5545: lines longer than 75 octets continue with a leading space,
+    # never splitting a multi-byte UTF-8 character
+    if len(line) <= 75:
+        return line + b'\r\n'
+    parts = []
+    limit = 75
+    while len(line) > limit:
+        cut = limit
+        while line[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(line[:cut])
+        line = line[cut:]
+        limit = 74  # continuation lines spend one octet on the space
+    parts.append(line)
+    return b'\r\n '.join(parts) + b'\r\n'
+
+
+def _format_datetime(dt):
+    return f";TZID={dt.tzinfo.key}:{dt:%Y%m%dT%H%M%S}"
+
+
+def _format_trigger(delta):
+    total_minutes = int(delta.total_seconds() // 60)
+    sign = '-' if total_minutes < 0 else ''
+    hours, minutes = divmod(abs(total_minutes), 60)
+    if hours and minutes:
+        return f"{sign}PT{hours}H{minutes}M"
+    if hours:
+        return f"{sign}PT{hours}H"
+    return f"{sign}PT{minutes}M"
+
+
+def _serialize_event(event):
+    subject, start_datetime, end_datetime, description, alarms = event
+    lines = [
+        'BEGIN:VEVENT',
+        f'SUMMARY:{_escape_text(subject)}',
+        f'DTSTART{_format_datetime(start_datetime)}',
+        f'DTEND{_format_datetime(end_datetime)}',
+        f'DESCRIPTION:{_escape_text(description)}',
+    ]
+    for alarm_description, trigger in alarms:
+        lines += [
+            'BEGIN:VALARM',
+            'ACTION:DISPLAY',
+            f'DESCRIPTION:{_escape_text(alarm_description)}',
+            f'TRIGGER:{_format_trigger(trigger)}',
+            'END:VALARM',
+        ]
+    lines.append('END:VEVENT')
+    return b''.join(_fold(line.encode('utf-8')) for line in lines)
+
+
+def _previous_lesson_triggers(time_objs):
+    # Reminder trigger for a lesson when the previous lesson ends, keyed by
+    # (previous period, period); the gap only depends on the time slots
+    triggers = {}
+    for previous_period, (_, previous_end) in time_objs.items():
+        for period, (start, _) in time_objs.items():
+            if previous_period < period:
+                gap = (datetime.datetime.combine(datetime.date.min, start)
+                       - datetime.datetime.combine(datetime.date.min, previous_end))
+                triggers[(previous_period, period)] = -gap
+    return triggers
+
+
 class ScheduleConverter:
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("Berufsschule Schedule to ICS Converter")
         self.root.geometry("800x700")
         
-        self.schedule_data = {}
+        self.subjects_by_date = {}  # date -> {period: subject}
         self.html_file = None
         self.week_vars = {}
+        self.weeks_by_monday = {}
+        self.week_widgets = []  # (checkbox, subjects label) pairs, reused across loads
         self.reminder_vars = {}
         
         # Time slots for Monday-Thursday
@@ -42,8 +146,19 @@ class ScheduleConverter:
             7: ("13:00", "14:30"),  # 7-8 UE (ILIAS-Lernauftrag - skip this)
         }
         
-        # Subjects to ignore
-        self.ignore_subjects = {"#NV", "Frei", "Betrieb", "Feiertag", "", " "}
+        # Parsed datetime.time versions of the slots above, built once
+        self.weekday_time_objs = {
+            period: (datetime.time.fromisoformat(start), datetime.time.fromisoformat(end))
+            for period, (start, end) in self.weekday_times.items()
+        }
+        self.friday_time_objs = {
+            period: (datetime.time.fromisoformat(start), datetime.time.fromisoformat(end))
+            for period, (start, end) in self.friday_times.items()
+        }
+        
+        # Reminder triggers for the end of the previous lesson
+        self.weekday_prev_triggers = _previous_lesson_triggers(self.weekday_time_objs)
+        self.friday_prev_triggers = _previous_lesson_triggers(self.friday_time_objs)
         
         self.setup_ui()
     
@@ -139,10 +254,14 @@ class ScheduleConverter:
             return
         
         try:
-            with open(self.html_file, 'r', encoding='utf-8') as file:
+            from bs4 import BeautifulSoup, SoupStrainer
+            
+            with open(self.html_file, 'rb') as file:
                 content = file.read()
             
-            soup = BeautifulSoup(content, 'html.parser')
+            # Only build the tree for the schedule table, skip head/scripts/styles
+            only_tables = SoupStrainer('table')
+            soup = BeautifulSoup(content, HTML_PARSER, from_encoding='utf-8', parse_only=only_tables)
             self.parse_schedule(soup)
             self.display_weeks()
             messagebox.showinfo("Success", "Schedule loaded successfully!")
@@ -155,29 +274,20 @@ class ScheduleConverter:
         if not table:
             raise Exception("No table found in HTML file")
         
-        rows = table.find_all('tr')
-        
-        # Find the data rows (skip header rows)
-        data_rows = []
-        for i, row in enumerate(rows):
-            cells = row.find_all(['td', 'th'])
-            if len(cells) >= 12 and cells[0].get_text().strip():
-                # Check if first cell contains a date
-                date_text = cells[0].get_text().strip()
-                if re.match(r'\d{1,2}\.\s*\w+', date_text):
-                    data_rows.append(row)
-        
-        # Parse each data row
-        for row in data_rows:
+        # Parse each data row (skip header rows) in a single pass
+        for row in table.find_all('tr'):
             cells = row.find_all(['td', 'th'])
             if len(cells) < 12:
                 continue
-                
-            date_text = cells[0].get_text().strip()
-            day_text = cells[1].get_text().strip()
+            
+            # Plain get_text keeps inline markup like <b>15</b>. Sep together
+            texts = [cell.get_text().strip() for cell in cells[:12]]
+            date_text = texts[0]
+            if not date_text:
+                continue
             
             # Parse date
-            date_match = re.match(r'(\d{1,2})\.\s*(\w+)', date_text)
+            date_match = _DATE_RE.match(date_text)
             if not date_match:
                 continue
                 
@@ -185,12 +295,7 @@ class ScheduleConverter:
             month_name = date_match.group(2).lower()
             
             # Convert German month names to numbers
-            month_map = {
-                'jan': 1, 'feb': 2, 'mär': 3, 'apr': 4, 'mai': 5, 'jun': 6,
-                'jul': 7, 'aug': 8, 'sep': 9, 'okt': 10, 'nov': 11, 'dez': 12
-            }
-            
-            month_num = month_map.get(month_name[:3], 1)
+            month_num = _MONTH_MAP.get(month_name[:3], 1)
             
             # Determine year (assume current academic year 2025/2026)
             year = 2025 if month_num >= 8 else 2026
@@ -202,64 +307,68 @@ class ScheduleConverter:
             
             # Parse subjects for each time slot (columns 2-11 represent periods 1-10)
             day_schedule = {}
-            for i in range(2, 12):  # Columns 2-11
-                if i < len(cells):
-                    subject_text = cells[i].get_text().strip()
-                    # Clean up subject text
-                    subject_lines = [line.strip() for line in subject_text.split('\n') if line.strip()]
-                    if subject_lines and subject_lines[0] not in self.ignore_subjects:
-                        period = i - 1  # Convert to period number (1-10)
-                        day_schedule[period] = subject_lines[0]
+            for i, subject_text in enumerate(texts[2:12], start=2):  # Columns 2-11
+                # Only the first line of a cell is the subject (text is already stripped)
+                first_line = subject_text.partition('\n')[0].rstrip()
+                if first_line and first_line not in _IGNORE_SUBJECTS:
+                    period = i - 1  # Convert to period number (1-10)
+                    # Subject codes repeat all year, share one string object per code
+                    day_schedule[period] = sys.intern(first_line)
             
             if day_schedule:  # Only add days that have subjects
-                self.schedule_data[date_obj] = {
-                    'day': day_text,
-                    'subjects': day_schedule
-                }
+                self.subjects_by_date[date_obj] = day_schedule
     
     def display_weeks(self):
-        # Clear existing widgets
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
+        # Hide existing widgets, they are reused below instead of recreated
+        for checkbox, subjects_label in self.week_widgets:
+            checkbox.grid_remove()
+            subjects_label.grid_remove()
         
         self.week_vars.clear()
         
-        # Group dates by week
-        weeks = {}
-        for date_obj in sorted(self.schedule_data.keys()):
+        # Group dates by week (kept for generate_ics) and collect each week's
+        # subjects in the same pass; dates are sorted, so weeks are too
+        weeks = self.weeks_by_monday
+        weeks.clear()
+        week_subjects = {}
+        for date_obj in sorted(self.subjects_by_date):
             # Get Monday of the week
             monday = date_obj - datetime.timedelta(days=date_obj.weekday())
             if monday not in weeks:
                 weeks[monday] = []
+                week_subjects[monday] = set()
             weeks[monday].append(date_obj)
+            week_subjects[monday].update(self.subjects_by_date[date_obj].values())
         
         # Create checkboxes for each week
         row = 0
-        for monday in sorted(weeks.keys()):
-            week_dates = sorted(weeks[monday])
-            
+        for monday, week_dates in weeks.items():
             # Create week label
             week_start = week_dates[0]
             week_end = week_dates[-1]
             week_label = f"Week {week_start.strftime('%d.%m')} - {week_end.strftime('%d.%m.%Y')}"
             
-            # Get subjects for this week
-            week_subjects = set()
-            for date_obj in week_dates:
-                week_subjects.update(self.schedule_data[date_obj]['subjects'].values())
-            
-            subjects_text = ", ".join(sorted(week_subjects)) if week_subjects else "No subjects"
+            subjects = week_subjects[monday]
+            subjects_text = ", ".join(sorted(subjects)) if subjects else "No subjects"
             
             # Create checkbox
             var = tk.BooleanVar(value=True)
             self.week_vars[monday] = var
             
-            checkbox = ttk.Checkbutton(self.scrollable_frame, variable=var, text=week_label)
-            checkbox.grid(row=row, column=0, sticky=tk.W, pady=2)
+            index = row // 2
+            if index < len(self.week_widgets):
+                checkbox, subjects_label = self.week_widgets[index]
+                checkbox.configure(variable=var, text=week_label)
+                subjects_label.configure(text=f"Subjects: {subjects_text}")
+            else:
+                checkbox = ttk.Checkbutton(self.scrollable_frame, variable=var, text=week_label)
+                
+                # Create subjects label
+                subjects_label = ttk.Label(self.scrollable_frame, text=f"Subjects: {subjects_text}", 
+                                         foreground="gray", font=("TkDefaultFont", 8))
+                self.week_widgets.append((checkbox, subjects_label))
             
-            # Create subjects label
-            subjects_label = ttk.Label(self.scrollable_frame, text=f"Subjects: {subjects_text}", 
-                                     foreground="gray", font=("TkDefaultFont", 8))
+            checkbox.grid(row=row, column=0, sticky=tk.W, pady=2)
             subjects_label.grid(row=row+1, column=0, sticky=tk.W, padx=(20, 0))
             
             row += 2
@@ -273,7 +382,7 @@ class ScheduleConverter:
             var.set(False)
     
     def generate_ics(self):
-        if not self.schedule_data:
+        if not self.subjects_by_date:
             messagebox.showerror("Error", "No schedule data loaded!")
             return
         
@@ -284,105 +393,63 @@ class ScheduleConverter:
             messagebox.showerror("Error", "No weeks selected!")
             return
         
-        # Create calendar
-        cal = Calendar()
-        cal.add('prodid', '-//Berufsschule Schedule Converter//mxm.dk//')
-        cal.add('version', '2.0')
-        cal.add('calscale', 'GREGORIAN')
+        # Set timezone (ZoneInfo caches the zone after the first load)
+        try:
+            timezone = zoneinfo.ZoneInfo(_TZ_NAME)
+        except zoneinfo.ZoneInfoNotFoundError:
+            messagebox.showerror("Error", f"Timezone data for {_TZ_NAME} not found!\n"
+                                          "Please install it: pip install tzdata")
+            return
         
-        # Set timezone
-        timezone = pytz.timezone('Europe/Berlin')
+        # Read reminder settings once instead of per event
+        want_first = self.reminder_vars['before_first'].get()
+        want_prev = self.reminder_vars['end_previous'].get()
         
         # Add events for selected weeks
+        events = []
         for monday in selected_weeks:
-            week_dates = []
-            for date_obj in self.schedule_data.keys():
-                if date_obj >= monday and date_obj < monday + datetime.timedelta(days=7):
-                    week_dates.append(date_obj)
+            week_dates = self.weeks_by_monday.get(monday, [])
             
             for date_obj in week_dates:
-                day_data = self.schedule_data[date_obj]
-                subjects = day_data['subjects']
+                subjects = self.subjects_by_date[date_obj]
                 
                 # Determine which time schedule to use
                 is_friday = date_obj.weekday() == 4
-                time_schedule = self.friday_times if is_friday else self.weekday_times
+                time_schedule = self.friday_time_objs if is_friday else self.weekday_time_objs
+                prev_triggers = self.friday_prev_triggers if is_friday else self.weekday_prev_triggers
                 
                 # Sort periods to find first lesson of the day
-                sorted_periods = sorted(subjects.keys())
-                first_period = sorted_periods[0] if sorted_periods else None
+                sorted_periods = sorted(subjects)
                 
-                # Find previous lesson for each period (for end-of-previous-lesson reminders)
-                previous_lessons = {}
                 for i, period in enumerate(sorted_periods):
-                    if i > 0:
-                        previous_lessons[period] = sorted_periods[i-1]
-                
-                for period, subject in subjects.items():
-                    if subject in self.ignore_subjects:
-                        continue
+                    subject = subjects[period]
+                    # Previous lesson (for end-of-previous-lesson reminders)
+                    previous_period = sorted_periods[i-1] if i > 0 else None
                     
                     # Get time for this period
                     if period in time_schedule:
-                        start_time_str, end_time_str = time_schedule[period]
-                        
-                        # Parse times
-                        start_time = datetime.datetime.strptime(start_time_str, "%H:%M").time()
-                        end_time = datetime.datetime.strptime(end_time_str, "%H:%M").time()
+                        start_time, end_time = time_schedule[period]
                         
                         # Create datetime objects
-                        start_datetime = timezone.localize(
-                            datetime.datetime.combine(date_obj, start_time)
-                        )
-                        end_datetime = timezone.localize(
-                            datetime.datetime.combine(date_obj, end_time)
-                        )
-                        
-                        # Create event
-                        event = Event()
-                        event.add('summary', subject)
-                        event.add('dtstart', start_datetime)
-                        event.add('dtend', end_datetime)
-                        event.add('description', f'Berufsschule - Period {period}')
+                        start_datetime = datetime.datetime.combine(date_obj, start_time, tzinfo=timezone)
+                        end_datetime = datetime.datetime.combine(date_obj, end_time, tzinfo=timezone)
                         
-                        # Add reminders
+                        # Add reminders as (description, trigger) pairs
                         alarms = []
                         
                         # 15 minutes before first lesson of the day
-                        if self.reminder_vars['before_first'].get() and period == first_period:
-                            from icalendar import Alarm
-                            alarm = Alarm()
-                            alarm.add('action', 'DISPLAY')
-                            alarm.add('description', f'First lesson starting soon: {subject}')
-                            alarm.add('trigger', datetime.timedelta(minutes=-15))
-                            alarms.append(alarm)
+                        if want_first and i == 0:
+                            alarms.append((f'First lesson starting soon: {subject}',
+                                           datetime.timedelta(minutes=-15)))
                         
                         # At the end of the previous lesson
-                        if self.reminder_vars['end_previous'].get() and period in previous_lessons:
-                            previous_period = previous_lessons[period]
-                            if previous_period in time_schedule:
-                                prev_end_time_str = time_schedule[previous_period][1]
-                                prev_end_time = datetime.datetime.strptime(prev_end_time_str, "%H:%M").time()
-                                prev_end_datetime = timezone.localize(
-                                    datetime.datetime.combine(date_obj, prev_end_time)
-                                )
-                                
-                                # Calculate minutes from previous lesson end to current lesson start
-                                time_diff = start_datetime - prev_end_datetime
-                                minutes_diff = int(time_diff.total_seconds() / 60)
-                                
-                                from icalendar import Alarm
-                                alarm = Alarm()
-                                alarm.add('action', 'DISPLAY')
-                                alarm.add('description', f'Next lesson preparation: {subject}')
-                                alarm.add('trigger', datetime.timedelta(minutes=-minutes_diff))
-                                alarms.append(alarm)
+                        if want_prev and (previous_period, period) in prev_triggers:
+                            alarms.append((f'Next lesson preparation: {subject}',
+                                           prev_triggers[(previous_period, period)]))
                         
-                        # Add alarms to event
-                        for alarm in alarms:
-                            event.add_component(alarm)
-                        
-                        cal.add_component(event)
+                        # Create event
+                        events.append((subject, start_datetime, end_datetime,
+                                       f'Berufsschule - Period {period}', alarms))
         
         # Save ICS file
         file_path = filedialog.asksaveasfilename(
@@ -393,8 +460,12 @@ class ScheduleConverter:
         
         if file_path:
             try:
-                with open(file_path, 'wb') as f:
-                    f.write(cal.to_ical())
+                # Events are streamed one by one between the calendar header and footer
+                with open(file_path, 'wb', buffering=1 << 20) as f:
+                    f.write(_CALENDAR_START)
+                    for event in events:
+                        f.write(_serialize_event(event))
+                    f.write(_CALENDAR_END)
                 messagebox.showinfo("Success", f"Calendar saved successfully to {Path(file_path).name}")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save calendar: {str(e)}")
@@ -403,17 +474,13 @@ class ScheduleConverter:
         self.root.mainloop()
 
 if __name__ == "__main__":
-    # Check for required packages
-    try:
-        import tkinter as tk
-        from tkinter import ttk, filedialog, messagebox
-        from bs4 import BeautifulSoup
-        from icalendar import Calendar, Event
-        import pytz
-    except ImportError as e:
-        print(f"Missing required package: {e}")
+    # Check for required packages (without importing them, they load lazily)
+    missing = [name for name in ("bs4",) if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"Missing required package: {', '.join(missing)}")
         print("Please install required packages:")
-        print("pip install beautifulsoup4 icalendar pytz")
+        print("pip install beautifulsoup4 tzdata")
+        print("Optional (faster parsing): pip install lxml")
         exit(1)
     
     app = ScheduleConverter()